@@ -1,52 +1,84 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 import pandas as pd
-import json
+import orjson
 import time
 from datetime import datetime
 import os
+import threading
 import webbrowser
+from html import escape
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from collections import Counter
+from itertools import islice
 
 # --- Configuration ---
 WP_API_BASE_URL = "https://preprintwatch.com/wp-json/pw-kgx3/v1/submit"
 CSV_FILE_PATH = "test_data.csv" # Ensure this file is uploaded to your Colab environment
 OUTPUT_LOG_FILE = "test_results.log"
+RESULTS_FILE_PATH = "test_results.jsonl" # Per-test results, one JSON object per line
+CSV_CHUNK_SIZE = 1000 # Number of CSV rows parsed into memory at a time
 REPORT_FILE_PATH = f"API_Performance_Report_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.html"
+MAX_WORKERS = 16 # Number of test requests in flight at once
+MAX_PENDING = 64 # Maximum test rows submitted to the pool but not yet written to the results file
+REQUEST_TIMEOUT = (5, 200) # (connect, read) timeout in seconds; responses take ~20-30s even without concurrent load
+
+LOG_FLUSH_INTERVAL = 50 # Flush the log file at least every N messages
+
+_log_lock = threading.Lock()
+_log_fh = None # Log file handle, kept open for the duration of run_tests()
+_log_count = 0
+
+# --- Shared HTTP Session ---
+# One pooled session is shared by all worker threads so TCP/TLS connections are kept alive between tests.
+session = requests.Session()
+# Connect failures and transient statuses are retried with exponential backoff; once retries run out the last
+# response is kept for the report. Read errors are never retried: the server has already received the submission.
+adapter = HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=32,
+    max_retries=Retry(
+        total=3,
+        read=False,
+        backoff_factor=0.5,
+        status_forcelist=[429, 502, 503, 504],
+        allowed_methods=frozenset(["POST"]),
+        raise_on_status=False
+    )
+)
+session.mount("https://", adapter)
 
 # --- Helper Function for Logging ---
+_timestamp_cache = (None, "") # (epoch second, formatted timestamp)
+
+def _log_timestamp():
+    """Returns the current local time for log entries, formatting at most once per second."""
+    global _timestamp_cache
+    second = int(time.time())
+    cached_second, formatted = _timestamp_cache
+    if second != cached_second:
+        formatted = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second))
+        _timestamp_cache = (second, formatted)
+    return formatted
+
 def log_message(message, level="INFO"):
     """Logs a message to both the console and a log file."""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    timestamp = _log_timestamp()
     log_entry = f"[{timestamp}] [{level}] {message}"
-    print(log_entry) # Print to Colab output
-    with open(OUTPUT_LOG_FILE, "a") as f:
-        f.write(log_entry + "\n")
+    global _log_count
+    with _log_lock:
+        print(log_entry) # Print to Colab output
+        if _log_fh is not None:
+            _log_fh.write(log_entry + "\n")
+            _log_count += 1
+            # Outcomes are flushed immediately; routine messages are batched
+            if level in ("ERROR", "SUCCESS") or _log_count % LOG_FLUSH_INTERVAL == 0:
+                _log_fh.flush()
 
 # --- HTML Report Generation Module ---
-def generate_html_report(results, summary):
-    """Generates a complete, standardized HTML report from the test results."""
-    # Helper function to determine row color based on status
-    def get_status_color(passed):
-        return "#d4edda" if passed else "#f8d7da"
-
-    # Build the detailed results table rows
-    results_rows_html = ""
-    for result in results:
-        results_rows_html += f"""
-        <tr style="background-color: {get_status_color(result['passed'])}">
-            <td>{result['test_case']}</td>
-            <td>{result['status_code']}</td>
-            <td>{f"{result['response_time']:.4f}s" if result['response_time'] is not None else 'N/A'}</td>
-            <td>{'PASS' if result['passed'] else 'FAIL'}</td>
-        </tr>
-        """
-
-    # Build the status code distribution table rows
-    status_dist_html = ""
-    for code, count in summary['status_code_distribution'].items():
-        status_dist_html += f"<tr><td>{int(code) if isinstance(code, float) else code}</td><td>{count}</td></tr>"
-
-
-    html_content = f"""
+# Report templates are built once at import; the static head and tail are pre-encoded bytes
+_REPORT_HEAD = """
     <!DOCTYPE html>
     <html lang="en">
     <head>
@@ -54,45 +86,49 @@ def generate_html_report(results, summary):
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
         <title>API Performance Report</title>
         <style>
-            body {{ font-family: Arial, sans-serif; margin: 20px; color: #333; }}
-            .container {{ max-width: 900px; margin: auto; border: 1px solid #ddd; padding: 20px; box-shadow: 0 0 10px rgba(0,0,0,0.05); }}
-            h1, h2 {{ color: #0056b3; border-bottom: 2px solid #0056b3; padding-bottom: 10px; }}
-            table {{ width: 100%; border-collapse: collapse; margin-top: 20px; }}
-            th, td {{ padding: 12px; border: 1px solid #ddd; text-align: left; }}
-            th {{ background-color: #f2f2f2; }}
-            .summary-card {{ background-color: #f8f9fa; border-left: 5px solid #0056b3; padding: 15px; margin: 20px 0; }}
-            .print-button {{
+            body { font-family: Arial, sans-serif; margin: 20px; color: #333; }
+            .container { max-width: 900px; margin: auto; border: 1px solid #ddd; padding: 20px; box-shadow: 0 0 10px rgba(0,0,0,0.05); }
+            h1, h2 { color: #0056b3; border-bottom: 2px solid #0056b3; padding-bottom: 10px; }
+            table { width: 100%; border-collapse: collapse; margin-top: 20px; }
+            th, td { padding: 12px; border: 1px solid #ddd; text-align: left; }
+            th { background-color: #f2f2f2; }
+            .summary-card { background-color: #f8f9fa; border-left: 5px solid #0056b3; padding: 15px; margin: 20px 0; }
+            .print-button {
                 display: block; width: 150px; margin: 20px auto; padding: 10px 15px;
                 background-color: #007bff; color: white; text-align: center;
                 border: none; border-radius: 5px; cursor: pointer; font-size: 16px;
-            }}
-            @media print {{
-                .print-button {{ display: none; }}
-            }}
+            }
+            @media print {
+                .print-button { display: none; }
+            }
         </style>
     </head>
     <body>
         <div class="container">
             <h1>KGX3 Performance Report - PW Shared Endpoint</h1>
-            <p><strong>Report Generated On:</strong> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
+""".encode("utf-8")
+
+# Summary sections, filled in once per report
+_REPORT_SUMMARY_TEMPLATE = """            <p><strong>Report Generated On:</strong> {generated_on}</p>
             <button class="print-button" onclick="window.print()">Save as PDF</button>
 
             <h2>Overall Summary</h2>
             <div class="summary-card">
-                <p><strong>Total Tests:</strong> {summary['total_requests']}</p>
-                <p><strong>Tests Passed:</strong> {summary['successful_requests']}</p>
-                <p><strong>Tests Failed:</strong> {summary['failed_requests']}</p>
-                <p><strong>Success Rate:</strong> {summary['success_rate']:.2f}%</p>
-                <p><strong>Total Duration:</strong> {summary['total_duration']:.2f} seconds</p>
-                <p><strong>Requests Per Second (RPS):</strong> {summary['requests_per_second']:.2f}</p>
+                <p><strong>Total Tests:</strong> {total_requests}</p>
+                <p><strong>Tests Passed:</strong> {successful_requests}</p>
+                <p><strong>Tests Failed:</strong> {failed_requests}</p>
+                <p><strong>Tests Retried:</strong> {retried_requests} (response times include retry attempts and backoff)</p>
+                <p><strong>Success Rate:</strong> {success_rate:.2f}%</p>
+                <p><strong>Total Duration:</strong> {total_duration:.2f} seconds</p>
+                <p><strong>Requests Per Second (RPS):</strong> {requests_per_second:.2f}</p>
             </div>
 
             <h2>Response Time Statistics (seconds)</h2>
             <table>
                 <tr><th>Metric</th><th>Value</th></tr>
-                <tr><td>Minimum</td><td>{summary['min_response_time']:.4f}s</td></tr>
-                <tr><td>Maximum</td><td>{summary['max_response_time']:.4f}s</td></tr>
-                <tr><td>Average</td><td>{summary['avg_response_time']:.4f}s</td></tr>
+                <tr><td>Minimum</td><td>{min_response_time:.4f}s</td></tr>
+                <tr><td>Maximum</td><td>{max_response_time:.4f}s</td></tr>
+                <tr><td>Average</td><td>{avg_response_time:.4f}s</td></tr>
             </table>
 
             <h2>Status Code Distribution</h2>
@@ -104,15 +140,50 @@ def generate_html_report(results, summary):
             <h2>Detailed Test Results</h2>
             <table>
                 <tr><th>Test Case Name</th><th>Status Code</th><th>Response Time</th><th>Result</th></tr>
-                {results_rows_html}
+    """
+
+# Row background color by test outcome
+_STATUS_COLOR = {True: "#d4edda", False: "#f8d7da"}
+
+def _render_row(test_case, status_code, response_time, passed):
+    """Renders one row of the detailed results table as UTF-8 bytes, escaping user-derived values."""
+    return f"""
+        <tr style="background-color: {_STATUS_COLOR[passed]}">
+            <td>{escape(str(test_case))}</td>
+            <td>{escape(str(status_code))}</td>
+            <td>{f"{response_time:.4f}s" if response_time is not None else 'N/A'}</td>
+            <td>{'PASS' if passed else 'FAIL'}</td>
+        </tr>
+        """.encode("utf-8")
+
+_REPORT_TAIL = """
             </table>
         </div>
     </body>
     </html>
-    """
+    """.encode("utf-8")
+
+def generate_html_report(results, summary):
+    """Generates a complete, standardized HTML report from the test results."""
+    # Build the status code distribution table rows
+    status_dist_html = "".join(
+        f"<tr><td>{escape(str(int(code) if isinstance(code, float) else code))}</td><td>{count}</td></tr>"
+        for code, count in summary['status_code_distribution'].items()
+    )
+
+    report_summary = _REPORT_SUMMARY_TEMPLATE.format(
+        generated_on=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        status_dist_html=status_dist_html,
+        **summary
+    ).encode("utf-8")
     try:
-        with open(REPORT_FILE_PATH, 'w') as f:
-            f.write(html_content)
+        # Stream the detailed results table row by row so no full report string is built in memory
+        with open(REPORT_FILE_PATH, 'wb') as f:
+            f.write(_REPORT_HEAD)
+            f.write(report_summary)
+            for result in results:
+                f.write(_render_row(result['test_case'], result['status_code'], result['response_time'], result['passed']))
+            f.write(_REPORT_TAIL)
         log_message(f"Successfully generated HTML report: {REPORT_FILE_PATH}", level="SUCCESS")
         # Automatically open the report in a new browser tab
         webbrowser.open('file://' + os.path.realpath(REPORT_FILE_PATH))
@@ -120,104 +191,175 @@ def generate_html_report(results, summary):
         log_message(f"Error generating HTML report: {e}", level="ERROR")
 
 
+# --- Streaming Helpers ---
+def iter_rows(reader):
+    """Yields normalized test case rows one at a time from a chunked CSV reader."""
+    for chunk in reader:
+        # Normalize missing values column-wise once per chunk instead of per row
+        chunk = chunk.fillna({"api_key": "", "email": ""})
+        expected_status = chunk["expected_status"]
+        chunk["expected_status"] = expected_status.astype(object).where(expected_status.notna(), None)
+        yield from chunk.to_dict("records")
+
+def iter_results():
+    """Yields test results back from the JSON lines results file."""
+    with open(RESULTS_FILE_PATH, "rb") as f:
+        for line in f:
+            yield orjson.loads(line)
+
+
+# --- Single Test Execution ---
+def _run_one(index, row):
+    """Runs a single test case row against the API and returns its result."""
+    test_case_name = row.get('test_case_name', f"Test Case {index + 1}")
+    api_key = row['api_key']
+    title = row['title']
+    pdf_url = row['pdf_url']
+    email = row['email']
+    expected_status = row['expected_status']
+
+    log_message(f"Running Test: {test_case_name} (Row {index + 1})")
+
+    headers = {
+        "Content-Type": "application/json",
+        "X-API-Key": api_key
+    }
+    if not api_key:
+        headers.pop("X-API-Key", None)
+
+    payload = {"title": title, "pdf_url": pdf_url, "email": email}
+
+    response_time = None
+    actual_status = None
+    test_passed = False
+    retries = 0
+
+    try:
+        start_time = time.perf_counter()
+        response = session.post(WP_API_BASE_URL, headers=headers, data=orjson.dumps(payload), timeout=REQUEST_TIMEOUT)
+        end_time = time.perf_counter()
+        # Includes any retried attempts and their backoff sleeps, so retried tests are flagged below
+        response_time = end_time - start_time
+        retry_state = getattr(response.raw, "retries", None)
+        retries = len(retry_state.history) if retry_state is not None else 0
+        if retries:
+            log_message(f"  NOTE: '{test_case_name}' was retried {retries} time(s); its response time includes the retries and backoff")
+        actual_status = response.status_code
+        test_passed = (actual_status == expected_status)
+        if test_passed:
+             log_message(f"  PASS: Status code matches for '{test_case_name}'", level="SUCCESS")
+        else:
+             log_message(f"  FAIL: Status code MISMATCH for '{test_case_name}'", level="ERROR")
+             try:
+                  log_message(f"    Response Body: {orjson.dumps(orjson.loads(response.content), option=orjson.OPT_INDENT_2).decode()}", level="ERROR")
+             except orjson.JSONDecodeError:
+                  log_message(f"    Raw Response Body: {response.text[:500]}", level="ERROR")
+
+
+    except requests.exceptions.Timeout:
+        log_message(f"  FAIL: Request timed out for '{test_case_name}'", level="ERROR")
+        actual_status = "Timeout"
+    except requests.exceptions.RequestException as e:
+        log_message(f"  FAIL: Request error for '{test_case_name}': {e}", level="ERROR")
+        actual_status = "Request Error"
+
+    return {
+        'test_case': test_case_name,
+        'status_code': actual_status,
+        'response_time': response_time,
+        'passed': test_passed,
+        'retries': retries
+    }
+
+
 # --- Main Test Function ---
 def run_tests():
-    if os.path.exists(OUTPUT_LOG_FILE):
-        os.remove(OUTPUT_LOG_FILE)
-    with open(OUTPUT_LOG_FILE, "w") as f:
-        f.write(f"--- API Test Log - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ---\n\n")
+    global _log_fh
+    _log_fh = open(OUTPUT_LOG_FILE, "w", buffering=8192)
+    try:
+        _log_fh.write(f"--- API Test Log - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ---\n\n")
+        _run_suite()
+    finally:
+        with _log_lock:
+            _log_fh.close()
+            _log_fh = None
 
+def _run_suite():
+    """Runs every test case from the CSV and generates the HTML report."""
     log_message(f"Starting API tests against: {WP_API_BASE_URL}")
 
     try:
-        df = pd.read_csv(CSV_FILE_PATH)
+        reader = pd.read_csv(
+            CSV_FILE_PATH,
+            chunksize=CSV_CHUNK_SIZE,
+            keep_default_na=True,
+            na_values=[""],
+            dtype={"api_key": str, "title": str, "pdf_url": str, "email": str, "expected_status": "Int64"}
+        )
     except FileNotFoundError:
         log_message(f"Error: CSV file not found at {CSV_FILE_PATH}. Please upload it.", level="ERROR")
         return
 
-    total_tests = len(df)
-    results_collector = []
-    suite_start_time = time.time()
-
-    for index, row in df.iterrows():
-        test_case_name = row.get('test_case_name', f"Test Case {index + 1}")
-        # ... (rest of the test execution logic is the same)
-        api_key = row['api_key']
-        title = row['title']
-        pdf_url = row['pdf_url']
-        email = row['email'] if pd.notna(row['email']) else ""
-        expected_status = int(row['expected_status']) if pd.notna(row['expected_status']) else None
-
-        log_message(f"Running Test: {test_case_name} (Row {index + 1}/{total_tests})")
-
-        headers = {
-            "Content-Type": "application/json",
-            "X-API-Key": str(api_key)
-        }
-        if not api_key:
-            headers.pop("X-API-Key", None)
-
-        payload = {"title": title, "pdf_url": pdf_url, "email": email}
-
-        response_time = None
-        actual_status = None
-        test_passed = False
-
-        try:
-            start_time = time.time()
-            response = requests.post(WP_API_BASE_URL, headers=headers, data=json.dumps(payload), timeout=200)
-            end_time = time.time()
-            response_time = end_time - start_time
-            actual_status = response.status_code
-            test_passed = (actual_status == expected_status)
-            if test_passed:
-                 log_message(f"  PASS: Status code matches for '{test_case_name}'", level="SUCCESS")
-            else:
-                 log_message(f"  FAIL: Status code MISMATCH for '{test_case_name}'", level="ERROR")
-                 try:
-                      log_message(f"    Response Body: {json.dumps(response.json(), indent=2)}", level="ERROR")
-                 except json.JSONDecodeError:
-                      log_message(f"    Raw Response Body: {response.text[:500]}", level="ERROR")
-
-
-        except requests.exceptions.Timeout:
-            log_message(f"  FAIL: Request timed out for '{test_case_name}'", level="ERROR")
-            actual_status = "Timeout"
-        except requests.exceptions.RequestException as e:
-            log_message(f"  FAIL: Request error for '{test_case_name}': {e}", level="ERROR")
-            actual_status = "Request Error"
-
-        results_collector.append({
-            'test_case': test_case_name,
-            'status_code': actual_status,
-            'response_time': response_time,
-            'passed': test_passed
-        })
-        time.sleep(1)
-
-    total_suite_duration = time.time() - suite_start_time
+    suite_start_time = time.perf_counter()
+
+    with reader, open(RESULTS_FILE_PATH, "wb") as results_file, ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        rows = enumerate(iter_rows(reader))
+        pending = {} # future -> row index
+        buffered = {} # row index -> result finished ahead of an earlier row
+        next_index = 0
+        while True:
+            # Top up as soon as any row finishes, keeping at most MAX_PENDING rows in flight or buffered
+            for index, row in islice(rows, MAX_PENDING - len(pending) - len(buffered)):
+                pending[pool.submit(_run_one, index, row)] = index
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                buffered[pending.pop(future)] = future.result()
+            # Stream results to disk in CSV order instead of holding the whole suite in memory
+            while next_index in buffered:
+                results_file.write(orjson.dumps(buffered.pop(next_index), option=orjson.OPT_APPEND_NEWLINE))
+                next_index += 1
+
+    total_suite_duration = time.perf_counter() - suite_start_time
 
     # --- Analysis and Reporting ---
-    results_df = pd.DataFrame(results_collector)
-    total_requests = len(results_df)
-    successful_requests = results_df['passed'].sum()
-    response_times = results_df[results_df['response_time'].notna()]['response_time']
+    # Single streaming pass over the results file; nothing is held in memory but the running totals
+    total_requests = 0
+    successful_requests = 0
+    retried_requests = 0
+    status_counts = Counter()
+    response_times_count = 0
+    response_times_sum = 0.0
+    min_response_time = max_response_time = None
+    for result in iter_results():
+        total_requests += 1
+        successful_requests += result['passed']
+        retried_requests += result['retries'] > 0
+        status_counts[result['status_code']] += 1
+        response_time = result['response_time']
+        if response_time is not None:
+            response_times_count += 1
+            response_times_sum += response_time
+            min_response_time = response_time if min_response_time is None else min(min_response_time, response_time)
+            max_response_time = response_time if max_response_time is None else max(max_response_time, response_time)
 
     summary_data = {
         "total_requests": total_requests,
         "successful_requests": successful_requests,
         "failed_requests": total_requests - successful_requests,
+        "retried_requests": retried_requests,
         "success_rate": (successful_requests / total_requests * 100) if total_requests > 0 else 0,
         "total_duration": total_suite_duration,
         "requests_per_second": total_requests / total_suite_duration if total_suite_duration > 0 else 0,
-        "min_response_time": response_times.min() if not response_times.empty else 0,
-        "max_response_time": response_times.max() if not response_times.empty else 0,
-        "avg_response_time": response_times.mean() if not response_times.empty else 0,
-        "status_code_distribution": results_df['status_code'].value_counts().to_dict()
+        "min_response_time": min_response_time if response_times_count else 0.0,
+        "max_response_time": max_response_time if response_times_count else 0.0,
+        "avg_response_time": response_times_sum / response_times_count if response_times_count else 0.0,
+        "status_code_distribution": dict(status_counts.most_common())
     }
 
     # --- Generate and save the HTML report ---
-    generate_html_report(results_collector, summary_data)
+    generate_html_report(iter_results(), summary_data)
 
 
 # Run the tests